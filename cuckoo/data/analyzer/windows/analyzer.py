@@ -3,26 +3,37 @@
 # This file is part of Cuckoo Sandbox - http://www.cuckoosandbox.org
 # See the file 'docs/LICENSE' for copying permission.
 
+import collections
 import datetime
 import hashlib
+import importlib
+import inspect
 import logging
 import os
 import pkgutil
-import socket
 import struct
 import sys
 import threading
 import traceback
-import urllib
-import urllib2
-import xmlrpclib
 import zipfile
 
+try:
+    import Queue as queue
+    import xmlrpclib
+    from urllib import urlencode
+    from urllib2 import urlopen
+except ImportError:
+    import queue
+    import xmlrpc.client as xmlrpclib
+    from urllib.parse import urlencode
+    from urllib.request import urlopen
+
 from lib.api.process import Process
 from lib.common.abstracts import Package, Auxiliary
 from lib.common.constants import SHUTDOWN_MUTEX
 from lib.common.decide import dump_memory
-from lib.common.defines import KERNEL32
+from lib.common.defines import KERNEL32, HANDLE, SYNCHRONIZE
+from lib.common.defines import MAXIMUM_WAIT_OBJECTS, WAIT_OBJECT_0, WAIT_TIMEOUT
 from lib.common.exceptions import CuckooError, CuckooDisableModule
 from lib.common.hashing import hash_file
 from lib.common.rand import random_string
@@ -37,13 +48,45 @@ from modules import auxiliary
 
 log = logging.getLogger("analyzer")
 
+def run_parallel(fn, args):
+    """Calls a function for each argument in a thread of its own and waits
+    for all of them to finish.
+    @param fn: function to call, should handle its own exceptions.
+    @param args: list of arguments.
+    @return: list of return values, in the same order as the arguments.
+    """
+    results, threads = [None] * len(args), []
+
+    def worker(idx, arg):
+        results[idx] = fn(arg)
+
+    for idx, arg in enumerate(args):
+        t = threading.Thread(target=worker, args=(idx, arg))
+        t.daemon = True
+        t.start()
+        threads.append(t)
+
+    for t in threads:
+        t.join()
+    return results
+
 class Files(object):
     PROTECTED_NAMES = ()
 
+    # Smaller files are cheap enough to simply be hashed again.
+    HASH_CACHE_MINSIZE = 64*1024
+    HASH_CACHE_SIZE = 4096
+
+    # Amount of threads uploading the remaining files at the end.
+    UPLOAD_THREADS = 4
+
     def __init__(self):
         self.files = {}
         self.files_orig = {}
-        self.dumped = []
+        self.dumped = set()
+        self.hashes = collections.OrderedDict()
+        self.hashes_lock = threading.Lock()
+        self.dumped_lock = threading.Lock()
 
     def is_protected_filename(self, file_name):
         """Do we want to inject into a process with this name?"""
@@ -51,83 +94,142 @@ class Files(object):
 
     def add_pid(self, filepath, pid, verbose=True):
         """Tracks a process identifier for this file."""
-        if not pid or filepath.lower() not in self.files:
+        pids = self.files.get(filepath.lower())
+        if not pid or pids is None:
             return
 
-        if pid not in self.files[filepath.lower()]:
-            self.files[filepath.lower()].append(pid)
+        if pid not in pids:
+            pids.append(pid)
             verbose and log.info("Added pid %s for %r", pid, filepath)
 
     def add_file(self, filepath, pid=None):
         """Add filepath to the list of files and track the pid."""
-        if filepath.lower() not in self.files:
+        key = filepath.lower()
+        if key not in self.files:
             log.info(
                 "Added new file to list with pid %s and path %s",
                 pid, filepath.encode("utf8")
             )
-            self.files[filepath.lower()] = []
-            self.files_orig[filepath.lower()] = filepath
+            self.files[key] = []
+            self.files_orig[key] = filepath
 
         self.add_pid(filepath, pid, verbose=False)
 
+    def calc_sha256(self, filepath):
+        """Calculates the SHA256 of a file, re-using an earlier result if
+        the size, creation and modification time of the file haven't changed
+        since."""
+        st = os.stat(filepath)
+        if st.st_size < self.HASH_CACHE_MINSIZE:
+            return hash_file(hashlib.sha256, filepath)
+
+        # The pipe handler threads share this cache and OrderedDict isn't
+        # thread-safe, hence the lock. On Windows st_ctime is the creation
+        # time, which changes when a file is replaced by a new one.
+        cache_key = filepath.lower(), st.st_size, st.st_ctime, st.st_mtime
+        with self.hashes_lock:
+            sha256 = self.hashes.get(cache_key)
+        if sha256 is not None:
+            return sha256
+
+        sha256 = hash_file(hashlib.sha256, filepath)
+        with self.hashes_lock:
+            self.hashes[cache_key] = sha256
+
+            # Evict the oldest entries first.
+            while len(self.hashes) > self.HASH_CACHE_SIZE:
+                self.hashes.popitem(last=False)
+        return sha256
+
     def dump_file(self, filepath):
         """Dump a file to the host."""
+        # If available use the original filepath, the one that is not
+        # lowercased.
+        key = filepath.lower()
+        filepath = self.files_orig.get(key, filepath)
+
         if not os.path.isfile(filepath):
             log.warning("File at path %r does not exist, skip.", filepath)
             return False
 
         # Check whether we've already dumped this file - in that case skip it.
         try:
-            sha256 = hash_file(hashlib.sha256, filepath)
-            if sha256 in self.dumped:
-                return
-        except IOError as e:
+            sha256 = self.calc_sha256(filepath)
+        except (IOError, OSError) as e:
             log.info("Error dumping file from path \"%s\": %s", filepath, e)
             return
 
+        # Claim the hash before uploading, so that the upload threads don't
+        # each upload their own copy of identical files.
+        with self.dumped_lock:
+            if sha256 in self.dumped:
+                return
+            self.dumped.add(sha256)
+
         filename = "%s_%s" % (sha256[:16], os.path.basename(filepath))
         upload_path = os.path.join("files", filename)
 
-        try:
-            upload_to_host(
-                # If available use the original filepath, the one that is
-                # not lowercased.
-                self.files_orig.get(filepath.lower(), filepath),
-                upload_path, self.files.get(filepath.lower(), [])
-            )
-            self.dumped.append(sha256)
-        except (IOError, socket.error) as e:
+        # Release the hash again if the upload failed, so that another copy
+        # of this file may still be uploaded.
+        if not upload_to_host(filepath, upload_path, self.files.get(key, [])):
+            with self.dumped_lock:
+                self.dumped.discard(sha256)
             log.error(
-                "Unable to upload dropped file at path \"%s\": %s",
-                filepath, e
+                "Unable to upload dropped file at path \"%s\"", filepath
             )
 
     def delete_file(self, filepath, pid=None):
         """A file is about to removed and thus should be dumped right away."""
         self.add_pid(filepath, pid)
-        self.dump_file(filepath)
-
-        # Remove the filepath from the files list.
-        self.files.pop(filepath.lower(), None)
-        self.files_orig.pop(filepath.lower(), None)
+        try:
+            self.dump_file(filepath)
+        finally:
+            # Remove the filepath from the files list.
+            key = filepath.lower()
+            self.files.pop(key, None)
+            self.files_orig.pop(key, None)
 
     def move_file(self, oldfilepath, newfilepath, pid=None):
         """A file will be moved - track this change."""
         self.add_pid(oldfilepath, pid)
-        if oldfilepath.lower() in self.files:
+
+        oldkey, newkey = oldfilepath.lower(), newfilepath.lower()
+        if oldkey in self.files:
             # Replace the entry with the new filepath.
-            self.files[newfilepath.lower()] = \
-                self.files.pop(oldfilepath.lower(), [])
+            self.files[newkey] = self.files.pop(oldkey)
+            self.files_orig.pop(oldkey, None)
+            self.files_orig[newkey] = newfilepath
 
     def dump_files(self):
         """Dump all pending files."""
+        # Files that are about to be deleted have to be uploaded before the
+        # monitor may continue, but nothing is waiting on the remaining
+        # files, so they're uploaded by a couple of threads at once.
+        pending = queue.Queue()
+
+        def upload(idx):
+            while True:
+                try:
+                    filepath = pending.get_nowait()
+                except queue.Empty:
+                    return
+
+                try:
+                    self.delete_file(filepath)
+                except Exception:
+                    log.exception("Error dumping file %r", filepath)
+
         while self.files:
-            self.delete_file(self.files.keys()[0])
+            for filepath in list(self.files):
+                pending.put(filepath)
+            run_parallel(upload, range(self.UPLOAD_THREADS))
 
 class ProcessList(object):
     def __init__(self):
-        self.pids = []
-        self.pids_notrack = []
+        self.pids = set()
+        self.pids_notrack = set()
+        self.handles = {}
+        self.lock = threading.Lock()
 
     def add_pid(self, pid, track=True):
         """Add a process identifier to the process list.
@@ -135,11 +237,13 @@ class ProcessList(object):
         Track determines whether the analyzer should be monitoring this
         process, i.e., whether Cuckoo should wait for this process to finish.
         """
-        if int(pid) not in self.pids and int(pid) not in self.pids_notrack:
-            if track:
-                self.pids.append(int(pid))
-            else:
-                self.pids_notrack.append(int(pid))
+        pid = int(pid)
+        with self.lock:
+            if pid not in self.pids and pid not in self.pids_notrack:
+                if track:
+                    self.pids.add(pid)
+                else:
+                    self.pids_notrack.add(pid)
 
     def add_pids(self, pids):
         """Add one or more process identifiers to the process list."""
@@ -161,11 +265,72 @@ class ProcessList(object):
 
     def remove_pid(self, pid):
         """Remove a process identifier from being tracked."""
-        if pid in self.pids:
-            self.pids.remove(pid)
+        with self.lock:
+            self.pids.discard(pid)
+            self.pids_notrack.discard(pid)
+
+    def is_alive(self, pid):
+        """Is this process still running? Uses the cached process handle if
+        there is one, rather than opening the process once again."""
+        handle = self.handles.get(pid)
+        if handle:
+            return KERNEL32.WaitForSingleObject(handle, 0) == WAIT_TIMEOUT
+        return Process(pid=pid).is_alive()
+
+    def wait(self, timeout):
+        """Wait for one of the tracked processes to terminate.
+
+        Note that the process handles are only opened and closed from here,
+        i.e., from the analyzer thread, so that no handle can be closed
+        while it's being waited upon.
+
+        @param timeout: maximum amount of milliseconds to wait.
+        @return: list of process identifiers that have terminated.
+        """
+        pids = list(self.pids)
+
+        for pid in set(self.handles).difference(pids):
+            handle = self.handles.pop(pid)
+            handle and KERNEL32.CloseHandle(handle)
+
+        for pid in pids:
+            if pid not in self.handles:
+                self.handles[pid] = KERNEL32.OpenProcess(
+                    SYNCHRONIZE, False, pid
+                )
+
+        # Processes that we're unable to open are considered to be dead,
+        # just like Process.is_alive() would.
+        terminated = [pid for pid in pids if not self.handles[pid]]
+        waitable = [pid for pid in pids if self.handles[pid]]
+
+        # WaitForMultipleObjects() only accepts a limited amount of handles,
+        # any remaining processes are checked one by one.
+        for pid in waitable[MAXIMUM_WAIT_OBJECTS:]:
+            if not self.is_alive(pid):
+                terminated.append(pid)
 
-        if pid in self.pids_notrack:
-            self.pids_notrack.remove(pid)
+        waitable = waitable[:MAXIMUM_WAIT_OBJECTS]
+        if terminated:
+            return terminated
+
+        if not waitable:
+            KERNEL32.Sleep(timeout)
+            return []
+
+        handles = (HANDLE * len(waitable))(
+            *[self.handles[pid] for pid in waitable]
+        )
+        ret = KERNEL32.WaitForMultipleObjects(
+            len(waitable), handles, False, timeout
+        )
+        if WAIT_OBJECT_0 <= ret < WAIT_OBJECT_0 + len(waitable):
+            return [waitable[ret - WAIT_OBJECT_0]]
+
+        # Don't end up in a busy loop in case waiting failed altogether.
+        if ret != WAIT_TIMEOUT:
+            KERNEL32.Sleep(timeout)
+        return []
 
 class CommandPipeHandler(object):
     """Pipe Handler.
@@ -179,6 +344,28 @@ class CommandPipeHandler(object):
         self.analyzer = analyzer
         self.tracked = {}
 
+        # One instance serves all command pipe connections, each of which
+        # is handled in its own thread, so the process identifier of the
+        # message that is being handled is stored per thread.
+        self.local = threading.local()
+
+        # Map each command onto its handler once rather than looking up the
+        # handler by name for every message.
+        self.handlers = {}
+        for name in dir(self):
+            if name.startswith("_handle_"):
+                command = name[len("_handle_"):].encode("utf8")
+                self.handlers[command] = getattr(self, name)
+
+    @property
+    def pid(self):
+        """Process identifier of the current message, if provided."""
+        return getattr(self.local, "pid", None)
+
+    @pid.setter
+    def pid(self, pid):
+        self.local.pid = pid
+
     def _handle_debug(self, data):
         """Debug message from the monitor."""
         log.debug(data)
@@ -197,12 +384,12 @@ class CommandPipeHandler(object):
 
     def _handle_loaded(self, data):
         """The monitor has loaded into a particular process."""
-        if not data or data.count(",") != 1:
+        if not data or data.count(b",") != 1:
             log.warning("Received loaded command with incorrect parameters, "
                         "skipping it.")
             return
 
-        pid, track = data.split(",")
+        pid, track = data.split(b",")
         if not pid.isdigit() or not track.isdigit():
             log.warning("Received loaded command with incorrect parameters, "
                         "skipping it.")
@@ -221,10 +408,6 @@ class CommandPipeHandler(object):
 
     def _inject_process(self, process_id, thread_id, mode):
         """Helper function for injecting the monitor into a process."""
-        # We acquire the process lock in order to prevent the analyzer to
-        # terminate the analysis while we are operating on the new process.
-        self.analyzer.process_lock.acquire()
-
         # Set the current DLL to the default one provided at submission.
         dll = self.analyzer.default_dll
 
@@ -233,51 +416,54 @@ class CommandPipeHandler(object):
                 log.warning("Received request to inject Cuckoo processes, "
                             "skipping it.")
                 self.ignore_list["pid"].append(process_id)
-            self.analyzer.process_lock.release()
             return
 
-        # We inject the process only if it's not being monitored already,
-        # otherwise we would generated polluted logs (if it wouldn't crash
-        # horribly to start with).
-        if self.analyzer.process_list.has_pid(process_id):
-            # This pid is already on the notrack list, move it to the
-            # list of tracked pids.
-            if not self.analyzer.process_list.has_pid(process_id, notrack=False):
-                log.debug("Received request to inject pid=%d. It was already "
-                          "on our notrack list, moving it to the track list.")
-
-                self.analyzer.process_list.remove_pid(process_id)
-                self.analyzer.process_list.add_pid(process_id)
-                self.ignore_list["pid"].append(process_id)
-            # Spit out an error once and just ignore it further on.
-            elif process_id not in self.ignore_list["pid"]:
-                self.ignore_list["pid"].append(process_id)
+        # We acquire the process lock in order to prevent the analyzer to
+        # terminate the analysis while we are operating on the new process.
+        # The lock is only held while checking and updating the list of
+        # processes, the injection itself happens outside of it.
+        with self.analyzer.process_lock:
+            # We inject the process only if it's not being monitored already,
+            # otherwise we would generated polluted logs (if it wouldn't crash
+            # horribly to start with).
+            if self.analyzer.process_list.has_pid(process_id):
+                # This pid is already on the notrack list, move it to the
+                # list of tracked pids.
+                if not self.analyzer.process_list.has_pid(process_id, notrack=False):
+                    log.debug("Received request to inject pid=%d. It was "
+                              "already on our notrack list, moving it to the "
+                              "track list.", process_id)
+
+                    self.analyzer.process_list.remove_pid(process_id)
+                    self.analyzer.process_list.add_pid(process_id)
+                    self.ignore_list["pid"].append(process_id)
+                # Spit out an error once and just ignore it further on.
+                elif process_id not in self.ignore_list["pid"]:
+                    self.ignore_list["pid"].append(process_id)
+                return
 
-            # We're done operating on the processes list, release the lock.
-            self.analyzer.process_lock.release()
-            return
+            # Add the new process ID to the list of monitored processes right
+            # away so that the analysis can't end while we're injecting.
+            self.analyzer.process_list.add_pid(process_id)
 
         # Open the process and inject the DLL. Hope it enjoys it.
         proc = Process(pid=process_id, tid=thread_id)
 
         filename = os.path.basename(proc.get_filepath())
 
-        if not self.analyzer.files.is_protected_filename(filename):
-            # Add the new process ID to the list of monitored processes.
-            self.analyzer.process_list.add_pid(process_id)
-
-            # We're done operating on the processes list,
-            # release the lock. Let the injection do its thing.
-            self.analyzer.process_lock.release()
+        if self.analyzer.files.is_protected_filename(filename):
+            with self.analyzer.process_lock:
+                self.analyzer.process_list.remove_pid(process_id)
+            return
 
-            # If we have both pid and tid, then we can use APC to inject.
-            if process_id and thread_id:
-                proc.inject(dll, apc=True, mode="%s" % mode)
-            else:
-                proc.inject(dll, apc=False, mode="%s" % mode)
+        # If we have both pid and tid, then we can use APC to inject.
+        if process_id and thread_id:
+            proc.inject(dll, apc=True, mode="%s" % mode)
+        else:
+            proc.inject(dll, apc=False, mode="%s" % mode)
 
-            log.info("Injected into process with pid %s and name %r",
-                     proc.pid, filename)
+        log.info("Injected into process with pid %s and name %r",
+                 proc.pid, filename)
 
     def _handle_process(self, data):
         """Request for injection into a process."""
@@ -292,12 +478,12 @@ class CommandPipeHandler(object):
     def _handle_process2(self, data):
         """Request for injection into a process using APC."""
         # Parse the process and thread identifier.
-        if not data or data.count(",") != 2:
+        if not data or data.count(b",") != 2:
             log.warning("Received PROCESS2 command from monitor with an "
                         "incorrect argument.")
             return
 
-        pid, tid, mode = data.split(",")
+        pid, tid, mode = data.split(b",")
         if not pid.isdigit() or not tid.isdigit() or not mode.isdigit():
             log.warning("Received PROCESS2 command from monitor with an "
                         "incorrect argument.")
@@ -318,12 +504,12 @@ class CommandPipeHandler(object):
 
     def _handle_file_move(self, data):
         """A file is being moved - track these changes."""
-        if "::" not in data:
+        if b"::" not in data:
             log.warning("Received FILE_MOVE command from monitor with an "
                         "incorrect argument.")
             return
 
-        old_filepath, new_filepath = data.split("::", 1)
+        old_filepath, new_filepath = data.split(b"::", 1)
         self.analyzer.files.move_file(
             old_filepath.decode("utf8"), new_filepath.decode("utf8"), self.pid
         )
@@ -366,14 +552,14 @@ class CommandPipeHandler(object):
             Process(pid=pid).dump_memory_block(int(addr), int(length))
 
     def _handle_track(self, data):
-        if not data.count(":") == 2:
+        if not data.count(b":") == 2:
             log.warning("Received TRACK command with an incorrect argument %r.", data)
             return
 
-        pid, scope, params = data.split(":", 2)
-        pid = int(pid)
+        pid, scope, params = data.split(b":", 2)
+        pid, scope = int(pid), scope.decode("utf8")
 
-        paramtuple = params.split(",")
+        paramtuple = params.split(b",")
         if pid not in self.tracked:
             self.tracked[pid] = {}
         if scope not in self.tracked[pid]:
@@ -381,32 +567,30 @@ class CommandPipeHandler(object):
         self.tracked[pid][scope].append(paramtuple)
 
     def dispatch(self, data):
-        response = "NOPE"
+        response = b"NOPE"
+        data = data.strip()
+
+        # Backwards compatibility (old syntax is, e.g., "FILE_NEW:" vs the
+        # new syntax, e.g., "1234:FILE_NEW:").
+        command, sep, arguments = data.partition(b":")
+        if sep and not data[:1].isupper():
+            self.pid = command
+            command, sep, arguments = arguments.partition(b":")
+        else:
+            self.pid = None
 
-        if not data or ":" not in data:
+        fn = self.handlers.get(command.lower()) if sep else None
+        if not fn:
             log.critical("Unknown command received from the monitor: %r",
-                         data.strip())
+                         data)
         else:
-            # Backwards compatibility (old syntax is, e.g., "FILE_NEW:" vs the
-            # new syntax, e.g., "1234:FILE_NEW:").
-            if data[0].isupper():
-                command, arguments = data.strip().split(":", 1)
-                self.pid = None
-            else:
-                self.pid, command, arguments = data.strip().split(":", 2)
-
-            fn = getattr(self, "_handle_%s" % command.lower(), None)
-            if not fn:
-                log.critical("Unknown command received from the monitor: %r",
-                             data.strip())
-            else:
-                try:
-                    response = fn(arguments)
-                except:
-                    log.exception(
-                        "Pipe command handler exception occurred (command "
-                        "%s args %r).", command, arguments
-                    )
+            try:
+                response = fn(arguments)
+            except:
+                log.exception(
+                    "Pipe command handler exception occurred (command "
+                    "%s args %r).", command, arguments
+                )
 
         return response
 
@@ -524,6 +708,45 @@ class Analyzer(object):
         # Hell yeah.
         log.info("Analysis completed.")
 
+    def start_auxiliary(self, module):
+        """Initialize and start an auxiliary module.
+        @param module: auxiliary module class.
+        @return: tuple of the module instance, if it could be created, and
+                 whether it has been started.
+        """
+        aux = None
+        try:
+            aux = module(options=self.config.options, analyzer=self)
+            aux.init()
+            aux.start()
+        except (NotImplementedError, AttributeError):
+            log.exception(
+                "Auxiliary module %s was not implemented", module.__name__
+            )
+        except CuckooDisableModule:
+            pass
+        except Exception as e:
+            log.exception(
+                "Cannot execute auxiliary module %s: %s",
+                module.__name__, e
+            )
+        else:
+            log.debug("Started auxiliary module %s", module.__name__)
+            return aux, True
+        return aux, False
+
+    def stop_auxiliary(self, aux):
+        """Terminate an auxiliary module.
+        @param aux: auxiliary module instance.
+        """
+        try:
+            aux.stop()
+        except (NotImplementedError, AttributeError):
+            pass
+        except Exception as e:
+            log.warning("Cannot terminate auxiliary module %s: %s",
+                        aux.__class__.__name__, e)
+
     def run(self):
         """Run analysis.
         @return: operation status.
@@ -571,18 +794,21 @@ class Analyzer(object):
 
         # Try to import the analysis package.
         try:
-            __import__(package_name, globals(), locals(), ["dummy"], -1)
+            package_module = importlib.import_module(package_name)
         # If it fails, we need to abort the analysis.
         except ImportError:
             raise CuckooError("Unable to import package \"{0}\", does "
                               "not exist.".format(package_name))
 
-        # Initialize the package parent abstract.
-        Package()
-
-        # Enumerate the abstract subclasses.
+        # Select the analysis package class defined by this very module,
+        # regardless of any other packages that have been imported so far.
+        members = inspect.getmembers(package_module, inspect.isclass)
         try:
-            package_class = Package.__subclasses__()[0]
+            package_class = [
+                cls for _, cls in members
+                if issubclass(cls, Package) and cls is not Package and
+                cls.__module__ == package_module.__name__
+            ][0]
         except IndexError as e:
             raise CuckooError("Unable to select package class "
                               "(package={0}): {1}".format(package_name, e))
@@ -601,39 +827,26 @@ class Analyzer(object):
         Auxiliary()
         prefix = auxiliary.__name__ + "."
         for loader, name, ispkg in pkgutil.iter_modules(auxiliary.__path__, prefix):
-            if ispkg:
+            if ispkg or name in sys.modules:
                 continue
 
             # Import the auxiliary module.
             try:
-                __import__(name, globals(), locals(), ["dummy"], -1)
+                importlib.import_module(name)
             except ImportError as e:
                 log.warning("Unable to import the auxiliary module "
                             "\"%s\": %s", name, e)
 
-        # Walk through the available auxiliary modules.
+        # Walk through the available auxiliary modules. They're started one
+        # after another, as on Python 2.7 a long-lived child process such as
+        # procmon.exe inherits any pipe another module has open at the time,
+        # and reading from that pipe would then never hit EOF.
         aux_enabled, aux_avail = [], []
         for module in Auxiliary.__subclasses__():
-            # Try to start the auxiliary module.
-            try:
-                aux = module(options=self.config.options, analyzer=self)
+            aux, started = self.start_auxiliary(module)
+            if aux:
                 aux_avail.append(aux)
-                aux.init()
-                aux.start()
-            except (NotImplementedError, AttributeError):
-                log.exception(
-                    "Auxiliary module %s was not implemented", module.__name__
-                )
-            except CuckooDisableModule:
-                continue
-            except Exception as e:
-                log.exception(
-                    "Cannot execute auxiliary module %s: %s",
-                    module.__name__, e
-                )
-            else:
-                log.debug("Started auxiliary module %s",
-                          module.__name__)
+            if started:
                 aux_enabled.append(aux)
 
         # Forward the command pipe and logpipe names on to zer0m0n.
@@ -671,9 +884,14 @@ class Analyzer(object):
             log.info("Enabled timeout enforce, running for the full timeout.")
             pid_check = False
 
+        # As the loop below wakes up as soon as a monitored process terminates
+        # the elapsed time is based on the tick count rather than on the
+        # amount of iterations. The first iteration counts as the first second.
+        terminated, start = [], KERNEL32.GetTickCount()
         while self.do_run:
-            self.time_counter += 1
-            if self.time_counter == int(self.config.timeout):
+            elapsed = (KERNEL32.GetTickCount() - start) & 0xffffffff
+            self.time_counter = elapsed // 1000 + 1
+            if self.time_counter >= int(self.config.timeout):
                 log.info("Analysis timeout hit, terminating analysis.")
                 break
 
@@ -684,48 +902,50 @@ class Analyzer(object):
                 KERNEL32.Sleep(1000)
                 continue
 
+            # If the process monitor is enabled we start checking whether
+            # the monitored processes are still alive.
+            if pid_check:
+                # We also track the PIDs provided by zer0m0n.
+                self.process_list.add_pids(zer0m0n.getpids())
+
+                for pid in terminated:
+                    log.info("Process with pid %s has terminated", pid)
+                    self.process_list.remove_pid(pid)
+
+                # If none of the monitored processes are still alive, we
+                # can terminate the analysis.
+                if not self.process_list.pids:
+                    log.info("Process list is empty, "
+                             "terminating analysis.")
+                    break
+
+                # Update the list of monitored processes available to the
+                # analysis package. It could be used for internal
+                # operations within the module.
+                self.package.set_pids(list(self.process_list.pids))
+
             try:
-                # If the process monitor is enabled we start checking whether
-                # the monitored processes are still alive.
-                if pid_check:
-                    # We also track the PIDs provided by zer0m0n.
-                    self.process_list.add_pids(zer0m0n.getpids())
-
-                    for pid in self.process_list.pids:
-                        if not Process(pid=pid).is_alive():
-                            log.info("Process with pid %s has terminated", pid)
-                            self.process_list.remove_pid(pid)
-
-                    # If none of the monitored processes are still alive, we
-                    # can terminate the analysis.
-                    if not self.process_list.pids:
-                        log.info("Process list is empty, "
-                                 "terminating analysis.")
-                        break
-
-                    # Update the list of monitored processes available to the
-                    # analysis package. It could be used for internal
-                    # operations within the module.
-                    self.package.set_pids(self.process_list.pids)
+                # The analysis packages are provided with a function that
+                # is executed at every loop's iteration. If such function
+                # returns False, it means that it requested the analysis
+                # to be terminate.
+                if not self.package.check():
+                    log.info("The analysis package requested the "
+                             "termination of the analysis.")
+                    break
+
+            # If the check() function of the package raised some exception
+            # we don't care, we can still proceed with the analysis but we
+            # throw a warning.
+            except Exception as e:
+                log.warning("The package \"%s\" check function raised "
+                            "an exception: %s", package_name, e)
 
-                try:
-                    # The analysis packages are provided with a function that
-                    # is executed at every loop's iteration. If such function
-                    # returns False, it means that it requested the analysis
-                    # to be terminate.
-                    if not self.package.check():
-                        log.info("The analysis package requested the "
-                                 "termination of the analysis.")
-                        break
-
-                # If the check() function of the package raised some exception
-                # we don't care, we can still proceed with the analysis but we
-                # throw a warning.
-                except Exception as e:
-                    log.warning("The package \"%s\" check function raised "
-                                "an exception: %s", package_name, e)
-            finally:
-                # Zzz.
+            # Zzz. Unless one of the monitored processes terminates. This is
+            # skipped when leaving the loop, as nothing's left to wait for.
+            if pid_check:
+                terminated = self.process_list.wait(1000)
+            else:
                 KERNEL32.Sleep(1000)
 
         if not self.do_run:
@@ -733,7 +953,7 @@ class Analyzer(object):
                       "auxiliary module.")
 
         # Create the shutdown mutex.
-        KERNEL32.CreateMutexA(None, False, SHUTDOWN_MUTEX)
+        KERNEL32.CreateMutexA(None, False, SHUTDOWN_MUTEX.encode("utf8"))
 
         try:
             # Before shutting down the analysis, the package can perform some
@@ -754,23 +974,16 @@ class Analyzer(object):
 
         # Terminate the Auxiliary modules.
         for aux in aux_enabled:
-            try:
-                aux.stop()
-            except (NotImplementedError, AttributeError):
-                continue
-            except Exception as e:
-                log.warning("Cannot terminate auxiliary module %s: %s",
-                            aux.__class__.__name__, e)
+            self.stop_auxiliary(aux)
 
         if self.config.terminate_processes:
             # Try to terminate remaining active processes.
             log.info("Terminating remaining processes before shutdown.")
 
-            for pid in self.process_list.pids:
-                proc = Process(pid=pid)
-                if proc.is_alive():
+            for pid in list(self.process_list.pids):
+                if self.process_list.is_alive(pid):
                     try:
-                        proc.terminate()
+                        Process(pid=pid).terminate()
                     except:
                         continue
 
@@ -832,5 +1045,5 @@ if __name__ == "__main__":
             server = xmlrpclib.Server("http://127.0.0.1:8000")
             server.complete(success, error, "unused_path")
         except xmlrpclib.ProtocolError:
-            urllib2.urlopen("http://127.0.0.1:8000/status",
-                            urllib.urlencode(data)).read()
+            urlopen("http://127.0.0.1:8000/status",
+                    urlencode(data).encode("utf8")).read()
@@ -23,6 +23,11 @@ from lib.core.ioctl import zer0m0n
 
 log = logging.getLogger(__name__)
 
+try:
+    integer_types = (int, long)
+except NameError:
+    integer_types = (int,)
+
 def spCreateProcessW(application_name, command_line, process_attributes,
                      thread_attributes, inherit_handles, creation_flags,
                      environment, current_directory, startup_info):
@@ -87,7 +92,9 @@ def spCreateProcessW(application_name, command_line, process_attributes,
     )
 
 # We patch Python 2.7's native .CreateProcess method to be unicode-aware.
-subprocess._subprocess.CreateProcess = spCreateProcessW
+# Python 3's _winapi.CreateProcess already is, and has no _subprocess.
+if hasattr(subprocess, "_subprocess"):
+    subprocess._subprocess.CreateProcess = spCreateProcessW
 KERNEL32.CreateProcessW.argtypes = (
     c_wchar_p, c_wchar_p, c_void_p, c_void_p, c_uint, c_uint, c_void_p,
     c_wchar_p, c_void_p, c_void_p
@@ -296,7 +303,7 @@ class Process(object):
         is32bit = self.is32bit(path=path)
 
         if source:
-            if isinstance(source, (int, long)) or source.isdigit():
+            if isinstance(source, integer_types) or source.isdigit():
                 inject_is32bit = self.is32bit(pid=int(source))
             else:
                 inject_is32bit = self.is32bit(process_name=source)
@@ -321,7 +328,7 @@ class Process(object):
             argv += ["--curdir", curdir]
 
         if source:
-            if isinstance(source, (int, long)) or source.isdigit():
+            if isinstance(source, integer_types) or source.isdigit():
                 argv += ["--from", "%s" % source]
             else:
                 argv += ["--from-process", source]
@@ -6,7 +6,10 @@
 import glob
 import os
 
-from _winreg import CreateKey, SetValueEx, CloseKey, REG_DWORD, REG_SZ
+try:
+    from _winreg import CreateKey, SetValueEx, CloseKey, REG_DWORD, REG_SZ
+except ImportError:
+    from winreg import CreateKey, SetValueEx, CloseKey, REG_DWORD, REG_SZ
 
 from lib.api.process import Process
 from lib.common.decide import dump_memory
@@ -37,6 +37,7 @@ THREAD_ALL_ACCESS         = 0x001f03ff
 TOKEN_ALL_ACCESS          = 0x000F01FF
 SE_PRIVILEGE_ENABLED      = 0x00000002
 STILL_ACTIVE              = 0x00000103
+SYNCHRONIZE               = 0x00100000
 
 PAGE_EXECUTE_READWRITE    = 0x00000040
 PAGE_EXECUTE              = 0x00000010
@@ -80,10 +81,15 @@ ERROR_BROKEN_PIPE         = 0x0000006d
 ERROR_MORE_DATA           = 0x000000EA
 ERROR_PIPE_CONNECTED      = 0x00000217
 
+WAIT_OBJECT_0             = 0x00000000
 WAIT_TIMEOUT              = 0x00000102
+WAIT_FAILED               = 0xFFFFFFFF
+MAXIMUM_WAIT_OBJECTS      = 64
 
 FILE_ATTRIBUTE_HIDDEN     = 0x00000002
 
+DRIVE_REMOTE              = 4
+
 WM_CLOSE                  = 0x00000010
 WM_GETTEXT                = 0x0000000D
 WM_GETTEXTLENGTH          = 0x0000000E
@@ -3,20 +3,75 @@
 # This file is part of Cuckoo Sandbox - http://www.cuckoosandbox.org
 # See the file 'docs/LICENSE' for copying permission.
 
+import hashlib
+import mmap
+import os
+import sys
+
+from lib.common.defines import KERNEL32, DRIVE_REMOTE
+
 BUFSIZE = 1024*1024
 
 
+def is_remote_path(path):
+    """Is this path on a network share, i.e., an UNC path or a path on a
+    mapped network drive?"""
+    path = os.path.abspath(path)
+    if isinstance(path, bytes):
+        path = path.decode(sys.getfilesystemencoding())
+
+    # Strip the \\?\ prefix of long paths, after which UNC paths are
+    # written as \\?\UNC\server\share.
+    if path.startswith(u"\\\\?\\"):
+        path = path[4:]
+        if path[:4].upper() == u"UNC\\":
+            return True
+
+    if path.startswith(u"\\\\"):
+        return True
+
+    drive = os.path.splitdrive(path)[0]
+    return KERNEL32.GetDriveTypeW(drive + u"\\") == DRIVE_REMOTE
+
+
 def hash_file(method, path):
     """Calculates an hash on a file by path.
     @param method: callable hashing method
     @param path: file path
     @return: computed hash string
     """
-    f = open(path, "rb")
-    h = method()
-    while True:
-        buf = f.read(BUFSIZE)
-        if not buf:
-            break
-        h.update(buf)
-    return h.hexdigest()
+    with open(path, "rb") as f:
+        # Map the file and let the hash object read straight from it. Empty
+        # files can't be mapped and files that don't fit in the address space
+        # (i.e., on 32-bit Python) are read in chunks instead. So are files on
+        # network shares, as a network error while reading a mapped page
+        # kills the process rather than raising an exception.
+        size = os.fstat(f.fileno()).st_size
+        if 0 < size <= sys.maxsize and not is_remote_path(path):
+            try:
+                m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (mmap.error, OverflowError, ValueError):
+                pass
+            else:
+                try:
+                    h = method()
+                    h.update(m)
+                    return h.hexdigest()
+                finally:
+                    m.close()
+
+        # Python 3.11+ streams the file straight into the hash object.
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, method).hexdigest()
+
+        # Otherwise read into one reusable buffer rather than allocating a
+        # new string for every chunk.
+        h = method()
+        buf = bytearray(BUFSIZE)
+        view = memoryview(buf)
+        while True:
+            length = f.readinto(buf)
+            if not length:
+                break
+            h.update(view[:length])
+        return h.hexdigest()
@@ -5,7 +5,10 @@
 
 import logging
 import struct
-import _winreg
+try:
+    import _winreg
+except ImportError:
+    import winreg as _winreg
 
 from ctypes import windll, POINTER, byref, pointer
 from ctypes import c_ushort, c_wchar_p, c_void_p, create_string_buffer
@@ -15,6 +18,11 @@ from lib.common.defines import UNICODE_STRING
 
 log = logging.getLogger(__name__)
 
+try:
+    text_type = unicode
+except NameError:
+    text_type = str
+
 RegOpenKeyExW = windll.advapi32.RegOpenKeyExW
 RegOpenKeyExW.argtypes = HANDLE, LPCWSTR, DWORD, ULONG, POINTER(HANDLE)
 RegOpenKeyExW.restype = LONG
@@ -89,7 +97,7 @@ def regkey_exists(rootkey, subkey):
 
 def set_regkey(rootkey, subkey, name, type_, value):
     if type_ == _winreg.REG_SZ:
-        value = unicode(value)
+        value = text_type(value)
         length = len(value) * 2 + 2
     elif type_ == _winreg.REG_MULTI_SZ:
         value = u"\u0000".join(value) + u"\u0000\u0000"
@@ -23,10 +23,13 @@ def upload_to_host(file_path, dump_path, pids=[]):
         infd = open(file_path, "rb")
         buf = infd.read(BUFSIZE)
         while buf:
-            nc.send(buf, retry=False)
+            if not nc.send(buf, retry=False):
+                return False
             buf = infd.read(BUFSIZE)
+        return True
     except Exception as e:
         log.error("Exception uploading file %r to host: %s", file_path, e)
+        return False
     finally:
         if infd:
             infd.close()
@@ -34,7 +37,10 @@ def upload_to_host(file_path, dump_path, pids=[]):
             nc.close()
 
 class NetlogConnection(object):
-    def __init__(self, proto=""):
+    # Send buffer size of the socket, None keeps the system default.
+    sndbuf = None
+
+    def __init__(self, proto=b""):
         config = Config(cfg="analysis.conf")
         self.hostip, self.hostport = config.ip, config.port
         self.sock = None
@@ -51,6 +57,8 @@ class NetlogConnection(object):
                 continue
 
             s.settimeout(None)
+            if self.sndbuf:
+                s.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.sndbuf)
             s.sendall(self.proto)
 
             self.sock = s
@@ -61,18 +69,24 @@ class NetlogConnection(object):
 
         try:
             self.sock.sendall(data)
+            return True
         except socket.error as e:
             if retry:
                 self.connect()
-                self.send(data, retry=False)
+                return self.send(data, retry=False)
             else:
-                print >>sys.stderr, "Unhandled exception in NetlogConnection:", str(e)
+                sys.stderr.write(
+                    "Unhandled exception in NetlogConnection: %s\n" % e
+                )
         except Exception as e:
-            print >>sys.stderr, "Unhandled exception in NetlogConnection:", str(e)
+            sys.stderr.write(
+                "Unhandled exception in NetlogConnection: %s\n" % e
+            )
             # We really have nowhere to log this, if the netlog connection
             # does not work, we can assume that any logging won't work either.
             # So we just fail silently.
             self.close()
+        return False
 
     def close(self):
         try:
@@ -81,23 +95,32 @@ class NetlogConnection(object):
             pass
 
 class NetlogFile(NetlogConnection):
+    # File uploads are pushed in chunks of BUFSIZE at a time, give the socket
+    # more room than the (8 KiB on older Windows versions) default.
+    sndbuf = 256*1024
+
     def init(self, dump_path, filepath=None, pids=[]):
         if filepath:
-            self.proto = "FILE 2\n%s\n%s\n%s\n" % (
-                dump_path.encode("utf8"), filepath.encode("utf8"),
-                " ".join(pids)
+            pids = b" ".join(
+                pid if isinstance(pid, bytes) else str(pid).encode("utf8")
+                for pid in pids
+            )
+            self.proto = b"FILE 2\n%s\n%s\n%s\n" % (
+                dump_path.encode("utf8"), filepath.encode("utf8"), pids
             )
         else:
-            self.proto = "FILE\n%s\n" % dump_path.encode("utf8")
+            self.proto = b"FILE\n%s\n" % dump_path.encode("utf8")
 
         self.connect()
 
 class NetlogHandler(logging.Handler, NetlogConnection):
     def __init__(self):
         logging.Handler.__init__(self)
-        NetlogConnection.__init__(self, proto="LOG\n")
+        NetlogConnection.__init__(self, proto=b"LOG\n")
         self.connect()
 
     def emit(self, record):
-        msg = self.format(record)
-        self.send("{0}\n".format(msg))
+        msg = "%s\n" % self.format(record)
+        if not isinstance(msg, bytes):
+            msg = msg.encode("utf8")
+        self.send(msg)
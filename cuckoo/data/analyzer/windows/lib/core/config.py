@@ -3,18 +3,23 @@
 # This file is part of Cuckoo Sandbox - http://www.cuckoosandbox.org
 # See the file 'docs/LICENSE' for copying permission.
 
-import ConfigParser
+try:
+    import ConfigParser as configparser
+except ImportError:
+    import configparser
 
 class Config:
     def __init__(self, cfg):
         """@param cfg: configuration file."""
-        config = ConfigParser.ConfigParser(allow_no_value=True)
+        config = configparser.ConfigParser(allow_no_value=True)
         config.read(cfg)
 
         for section in config.sections():
             for name, raw_value in config.items(section):
                 if name == "file_name":
-                    value = config.get(section, name).decode("utf8")
+                    value = config.get(section, name)
+                    if isinstance(value, bytes):
+                        value = value.decode("utf8")
                 elif name == "options":
                     value = self.parse_options(config.get(section, name))
                 else:
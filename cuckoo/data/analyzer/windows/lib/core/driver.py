@@ -6,7 +6,10 @@ import ctypes
 import os.path
 import platform
 import shutil
-import _winreg
+try:
+    import _winreg
+except ImportError:
+    import winreg as _winreg
 
 from lib.common.defines import NTDLL, UNICODE_STRING
 from lib.common.exceptions import CuckooError
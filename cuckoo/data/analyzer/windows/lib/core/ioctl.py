@@ -24,8 +24,9 @@ class Ioctl(object):
         self.pipepath = pipepath
 
     def invoke(self, ctlcode, value, outlength=0x1000):
+        device_path = ("\\\\.\\%s" % self.pipepath).encode("utf8")
         device_handle = KERNEL32.CreateFileA(
-            "\\\\.\\%s" % self.pipepath, GENERIC_READ | GENERIC_WRITE,
+            device_path, GENERIC_READ | GENERIC_WRITE,
             FILE_SHARE_READ | FILE_SHARE_WRITE, None, OPEN_EXISTING, 0, None
         ) % 2**32
 
@@ -80,10 +81,14 @@ class Zer0m0nIoctl(Ioctl):
         return self.invoke("addpid", struct.pack("I", pid))
 
     def cmdpipe(self, pipe):
-        return self.invoke("cmdpipe", "\x00".join(pipe + "\x00"))
+        return self.invoke(
+            "cmdpipe", "\x00".join(pipe + "\x00").encode("latin1")
+        )
 
     def channel(self, pipe):
-        return self.invoke("channel", "\x00".join(pipe + "\x00"))
+        return self.invoke(
+            "channel", "\x00".join(pipe + "\x00").encode("latin1")
+        )
 
     def dumpmem(self, pid):
         return self.invoke("dumpmem", struct.pack("I", pid))
@@ -92,8 +97,8 @@ class Zer0m0nIoctl(Ioctl):
         return self.invoke("yarald", open(rulepath, "rb").read())
 
     def getpids(self):
-        pids = self.invoke("getpids", "pids") or ""
-        return struct.unpack("I"*(len(pids)/4), pids)
+        pids = self.invoke("getpids", b"pids") or b""
+        return struct.unpack("I"*(len(pids)//4), pids)
 
     def hidepid(self, pid):
         return self.invoke("hidepid", struct.pack("I", pid))
@@ -80,7 +80,7 @@ class PipeForwarder(threading.Thread):
             )
 
             if success or KERNEL32.GetLastError() == ERROR_MORE_DATA:
-                sock.sendall(buf.raw[:bytes_read.value])
+                sock.sendall(buf[:bytes_read.value])
             # If we get the broken pipe error then this pipe connection has
             # been terminated for one reason or another. So break from the
             # loop and make the socket "inactive", that is, another pipe
@@ -111,7 +111,8 @@ class PipeDispatcher(threading.Thread):
     def _read_message(self, buf):
         """Reads a message."""
         bytes_read = c_uint()
-        ret = ""
+        bytes_left = c_uint()
+        ret = []
 
         while True:
             success = KERNEL32.ReadFile(
@@ -119,10 +120,19 @@ class PipeDispatcher(threading.Thread):
                 byref(bytes_read), None
             )
 
-            if KERNEL32.GetLastError() == ERROR_MORE_DATA:
-                ret += buf.raw[:bytes_read.value]
-            elif success:
-                return ret + buf.raw[:bytes_read.value]
+            if success:
+                ret.append(buf[:bytes_read.value])
+                return b"".join(ret)
+            elif KERNEL32.GetLastError() == ERROR_MORE_DATA:
+                ret.append(buf[:bytes_read.value])
+
+                # Fetch the remainder of this message with a single read
+                # rather than in chunks of the default buffer size.
+                success = KERNEL32.PeekNamedPipe(
+                    self.pipe_handle, None, 0, None, None, byref(bytes_left)
+                )
+                if success and bytes_left.value > sizeof(buf):
+                    buf = create_string_buffer(bytes_left.value)
             else:
                 return
 
@@ -136,7 +146,7 @@ class PipeDispatcher(threading.Thread):
             if not message:
                 break
 
-            response = self.dispatcher.dispatch(message) or "OK"
+            response = self.dispatcher.dispatch(message) or b"OK"
 
             KERNEL32.WriteFile(
                 self.pipe_handle, response, len(response),
@@ -158,17 +168,18 @@ class PipeServer(threading.Thread):
         self.do_run = True
 
     def run(self):
+        pipe_name = self.pipe_name.encode("utf8")
         while self.do_run:
             flags = FILE_FLAG_WRITE_THROUGH
             if self.message:
                 pipe_handle = KERNEL32.CreateNamedPipeA(
-                    self.pipe_name, PIPE_ACCESS_DUPLEX | flags,
+                    pipe_name, PIPE_ACCESS_DUPLEX | flags,
                     PIPE_TYPE_MESSAGE | PIPE_READMODE_MESSAGE | PIPE_WAIT,
                     PIPE_UNLIMITED_INSTANCES, BUFSIZE, BUFSIZE, 0, None
                 )
             else:
                 pipe_handle = KERNEL32.CreateNamedPipeA(
-                    self.pipe_name, PIPE_ACCESS_INBOUND | flags,
+                    pipe_name, PIPE_ACCESS_INBOUND | flags,
                     PIPE_TYPE_BYTE | PIPE_READMODE_BYTE | PIPE_WAIT,
                     PIPE_UNLIMITED_INSTANCES, 0, BUFSIZE, 0, None
                 )
@@ -5,7 +5,10 @@
 import logging
 import os.path
 import subprocess
-import _winreg
+try:
+    import _winreg
+except ImportError:
+    import winreg as _winreg
 
 from lib.common.abstracts import Auxiliary
 from lib.common.registry import set_regkey
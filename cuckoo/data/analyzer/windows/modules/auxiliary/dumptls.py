@@ -17,7 +17,7 @@ class DumpTLSMasterSecrets(Auxiliary):
             p = Process(process_name="lsass.exe")
             p.inject(track=False, mode="dumptls")
         except CuckooError as e:
-            if "process access denied" in e.message:
+            if "process access denied" in str(e):
                 log.warning(
                     "You're not running the Cuckoo Agent as Administrator. "
                     "Doing so will improve your analysis results!"
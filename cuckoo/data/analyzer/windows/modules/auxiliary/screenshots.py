@@ -3,8 +3,8 @@
 # This file is part of Cuckoo Sandbox - http://www.cuckoosandbox.org
 # See the file 'docs/LICENSE' for copying permission.
 
+import io
 import logging
-import StringIO
 import threading
 import time
 
@@ -69,11 +69,11 @@ class Screenshots(threading.Thread, Auxiliary):
             img_counter += 1
 
             # workaround as PIL can't write to the socket file object :(
-            tmpio = StringIO.StringIO()
+            tmpio = io.BytesIO()
             img_current.save(tmpio, format="JPEG")
             tmpio.seek(0)
 
-            # now upload to host from the StringIO
+            # now upload to host from the BytesIO
             nf = NetlogFile()
             nf.init("shots/%04d.jpg" % img_counter)
 
@@ -6,7 +6,10 @@
 import logging
 import os
 
-from _winreg import HKEY_LOCAL_MACHINE, HKEY_CURRENT_USER
+try:
+    from _winreg import HKEY_LOCAL_MACHINE, HKEY_CURRENT_USER
+except ImportError:
+    from winreg import HKEY_LOCAL_MACHINE, HKEY_CURRENT_USER
 
 from lib.common.abstracts import Package
 
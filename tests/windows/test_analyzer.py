@@ -5,8 +5,12 @@
 import collections
 import logging
 import mock
+import threading
 
-from analyzer import Analyzer, Files
+from analyzer import Analyzer, CommandPipeHandler, Files, ProcessList
+from analyzer import run_parallel
+from lib.common.defines import MAXIMUM_WAIT_OBJECTS, WAIT_FAILED
+from lib.common.defines import WAIT_TIMEOUT
 from lib.core.startup import init_logging
 
 osversion = collections.namedtuple("Version", ["major", "minor"])
@@ -35,3 +39,226 @@ def test_add_file_unicode(p):
     init_logging()
     Files().add_file("\xe2\x80\xae".decode("utf8"))
     logging.getLogger().handlers = handlers
+
+@mock.patch("analyzer.hash_file")
+def test_hash_cache(p, tmpdir):
+    p.return_value = "a"*64
+    filepath = tmpdir.join("foo.bin")
+    filepath.write("A"*Files.HASH_CACHE_MINSIZE)
+
+    f = Files()
+    assert f.calc_sha256(filepath.strpath) == "a"*64
+    assert f.calc_sha256(filepath.strpath) == "a"*64
+    assert p.call_count == 1
+
+    filepath.write("B"*(Files.HASH_CACHE_MINSIZE + 1))
+    f.calc_sha256(filepath.strpath)
+    assert p.call_count == 2
+
+@mock.patch("analyzer.hash_file")
+@mock.patch("os.stat")
+def test_hash_cache_ctime(p, q):
+    stat = collections.namedtuple("stat", ["st_size", "st_ctime", "st_mtime"])
+    q.side_effect = "a"*64, "b"*64
+
+    # Only the contents and the creation time of the file have changed.
+    f = Files()
+    p.return_value = stat(Files.HASH_CACHE_MINSIZE, 1, 2)
+    assert f.calc_sha256("C:\\foo.bin") == "a"*64
+    assert f.calc_sha256("C:\\foo.bin") == "a"*64
+    p.return_value = stat(Files.HASH_CACHE_MINSIZE, 3, 2)
+    assert f.calc_sha256("C:\\foo.bin") == "b"*64
+    assert q.call_count == 2
+
+@mock.patch("analyzer.log")
+def test_dispatch(p):
+    h = CommandPipeHandler(mock.MagicMock())
+
+    assert h.dispatch("1234:INFO:hello:world") is None
+    p.info.assert_called_once_with("hello:world")
+    assert h.pid == "1234"
+
+    assert h.dispatch("WARNING:foo") is None
+    p.warning.assert_called_once_with("foo")
+    assert h.pid is None
+
+    assert h.dispatch("1234:FOOBAR:") == "NOPE"
+    assert h.dispatch("1234:INFO") == "NOPE"
+    assert h.dispatch("foobar") == "NOPE"
+    assert p.critical.call_count == 3
+
+def test_process_list():
+    pl = ProcessList()
+    pl.add_pids([1, "2"])
+    pl.add_pid(3, track=False)
+    pl.add_pid(3)
+
+    assert pl.pids == set((1, 2))
+    assert pl.has_pid(3)
+    assert not pl.has_pid(3, notrack=False)
+
+    pl.remove_pid(1)
+    pl.remove_pid(3)
+    pl.remove_pid(4)
+    assert pl.pids == set((2,))
+    assert not pl.has_pid(3)
+
+def test_run_parallel():
+    assert run_parallel(lambda x: x*2, [1, 2, 3]) == [2, 4, 6]
+    assert run_parallel(lambda x: x, []) == []
+
+@mock.patch("analyzer.upload_to_host")
+def test_move_file(p, tmpdir):
+    newpath = tmpdir.join("Bar.TXT")
+    newpath.write("hello")
+
+    f = Files()
+    f.add_file(tmpdir.join("Foo.txt").strpath, 1)
+    f.move_file(tmpdir.join("foo.txt").strpath, newpath.strpath, 2)
+    f.dump_files()
+
+    p.assert_called_once_with(newpath.strpath, mock.ANY, [1, 2])
+    assert p.call_args[0][1].endswith("_Bar.TXT")
+    assert not f.files and not f.files_orig
+
+@mock.patch("analyzer.log")
+def test_dispatch_pid_per_thread(p):
+    h = CommandPipeHandler(mock.MagicMock())
+    h.dispatch("1234:INFO:foo")
+
+    t = threading.Thread(target=h.dispatch, args=("5678:INFO:bar",))
+    t.start()
+    t.join()
+
+    assert h.pid == "1234"
+
+@mock.patch("analyzer.upload_to_host")
+def test_dump_files_duplicate(p, tmpdir):
+    f = Files()
+    for dirname in ("a", "b", "c", "d", "e"):
+        filepath = tmpdir.mkdir(dirname).join("evil.exe")
+        filepath.write("MZ")
+        f.add_file(filepath.strpath, 1)
+    f.dump_files()
+
+    assert p.call_count == 1
+    assert p.call_args[0][1].endswith("_evil.exe")
+    assert not f.files and not f.files_orig
+
+@mock.patch("analyzer.log")
+@mock.patch("analyzer.upload_to_host")
+def test_dump_file_upload_failed(p, q, tmpdir):
+    p.return_value = False
+    a, b = tmpdir.join("a.exe"), tmpdir.join("b.exe")
+    a.write("MZ")
+    b.write("MZ")
+
+    f = Files()
+    f.dump_file(a.strpath)
+    f.dump_file(b.strpath)
+
+    assert p.call_count == 2
+    assert q.error.call_count == 2
+    assert not f.dumped
+
+@mock.patch("analyzer.log")
+@mock.patch("analyzer.Files.dump_file")
+def test_dump_files_error(p, q, tmpdir):
+    p.side_effect = Exception("foo")
+
+    f = Files()
+    f.add_file(tmpdir.join("foo.txt").strpath)
+    f.add_file(tmpdir.join("bar.txt").strpath)
+    f.dump_files()
+
+    assert p.call_count == 2
+    assert q.exception.call_count == 2
+    assert not f.files and not f.files_orig
+
+@mock.patch("analyzer.KERNEL32")
+def test_process_list_wait(p):
+    p.OpenProcess.side_effect = lambda access, inherit, pid: 0x100 + pid
+    p.WaitForMultipleObjects.return_value = WAIT_TIMEOUT
+
+    pl = ProcessList()
+    pl.add_pids([1, 2])
+    assert pl.wait(1000) == []
+    assert p.OpenProcess.call_count == 2
+    assert pl.handles == {1: 0x101, 2: 0x102}
+
+    # The handles of removed processes are closed, others are re-used.
+    pl.remove_pid(1)
+    p.WaitForMultipleObjects.return_value = 0
+    assert pl.wait(1000) == [2]
+    p.CloseHandle.assert_called_once_with(0x101)
+    assert p.OpenProcess.call_count == 2
+    assert pl.handles == {2: 0x102}
+    p.Sleep.assert_not_called()
+
+@mock.patch("analyzer.KERNEL32")
+def test_process_list_wait_openprocess(p):
+    p.OpenProcess.side_effect = lambda access, inherit, pid: pid % 2
+    p.WaitForMultipleObjects.return_value = WAIT_TIMEOUT
+
+    pl = ProcessList()
+    pl.add_pids([1, 2])
+    assert pl.wait(1000) == [2]
+    p.WaitForMultipleObjects.assert_not_called()
+
+    # Processes that couldn't be opened aren't closed either.
+    pl.remove_pid(2)
+    assert pl.wait(1000) == []
+    p.CloseHandle.assert_not_called()
+
+@mock.patch("analyzer.ProcessList.is_alive")
+@mock.patch("analyzer.KERNEL32")
+def test_process_list_wait_overflow(p, q):
+    p.OpenProcess.side_effect = lambda access, inherit, pid: pid
+    p.WaitForMultipleObjects.return_value = WAIT_TIMEOUT
+
+    pl = ProcessList()
+    pl.add_pids(list(range(1, MAXIMUM_WAIT_OBJECTS + 6)))
+
+    q.return_value = True
+    assert pl.wait(1000) == []
+    assert q.call_count == 5
+    assert p.WaitForMultipleObjects.call_args[0][0] == MAXIMUM_WAIT_OBJECTS
+
+    q.return_value = False
+    assert len(pl.wait(1000)) == 5
+    assert q.call_count == 10
+    assert p.WaitForMultipleObjects.call_count == 1
+
+@mock.patch("analyzer.KERNEL32")
+def test_process_list_wait_failed(p):
+    p.OpenProcess.return_value = 0x100
+    p.WaitForMultipleObjects.return_value = WAIT_FAILED
+
+    pl = ProcessList()
+    pl.add_pid(1)
+    assert pl.wait(1000) == []
+    p.Sleep.assert_called_once_with(1000)
+
+    p.Sleep.reset_mock()
+    p.WaitForMultipleObjects.return_value = WAIT_TIMEOUT
+    assert pl.wait(1000) == []
+    p.Sleep.assert_not_called()
+
+@mock.patch("analyzer.CommandPipeHandler._inject_process")
+def test_dispatch_arguments(p):
+    a = mock.MagicMock()
+    h = CommandPipeHandler(a)
+
+    h.dispatch(b"1234:LOADED:5678,1")
+    a.process_list.add_pid.assert_called_once_with(5678, track=1)
+
+    h.dispatch(b"1234:PROCESS2:5678,42,1")
+    p.assert_called_once_with(5678, 42, 1)
+
+    h.dispatch(b"1234:FILE_MOVE:C:\\a.txt::C:\\b.txt")
+    a.files.move_file.assert_called_once_with(
+        u"C:\\a.txt", u"C:\\b.txt", b"1234"
+    )
+
+    h.dispatch(b"1234:TRACK:5678:dumpreq:4096,16")
+    assert h.tracked == {5678: {"dumpreq": [[b"4096", b"16"]]}}
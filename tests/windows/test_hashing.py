@@ -0,0 +1,69 @@
+# Copyright (C) 2017 Cuckoo Foundation.
+# This file is part of Cuckoo Sandbox - http://www.cuckoosandbox.org
+# See the file 'docs/LICENSE' for copying permission.
+
+import hashlib
+import mmap
+import mock
+import os
+import pytest
+
+from lib.common.defines import DRIVE_REMOTE
+from lib.common.hashing import hash_file, is_remote_path, BUFSIZE
+
+sizes = 0, 1, 4096, 3*BUFSIZE + 1
+
+@pytest.mark.parametrize("size", sizes)
+def test_hash_file(tmpdir, size):
+    data = os.urandom(size)
+    filepath = tmpdir.join("foo.bin")
+    filepath.write(data, "wb")
+
+    assert hash_file(hashlib.sha256, filepath.strpath) == (
+        hashlib.sha256(data).hexdigest()
+    )
+
+@pytest.mark.parametrize("size", sizes)
+@mock.patch("mmap.mmap")
+def test_hash_file_nommap(p, tmpdir, size):
+    p.side_effect = mmap.error
+    data = os.urandom(size)
+    filepath = tmpdir.join("foo.bin")
+    filepath.write(data, "wb")
+
+    assert hash_file(hashlib.sha256, filepath.strpath) == (
+        hashlib.sha256(data).hexdigest()
+    )
+
+    # Also without hashlib.file_digest(), i.e., through the readinto() loop.
+    with mock.patch("lib.common.hashing.hashlib", object()):
+        assert hash_file(hashlib.sha256, filepath.strpath) == (
+            hashlib.sha256(data).hexdigest()
+        )
+    assert p.call_count == (2 if size else 0)
+
+@mock.patch("lib.common.hashing.KERNEL32")
+def test_is_remote_path(p):
+    p.GetDriveTypeW.return_value = 3  # DRIVE_FIXED
+    assert is_remote_path(u"\\\\server\\share\\evil.exe")
+    assert is_remote_path(u"\\\\?\\UNC\\server\\share\\evil.exe")
+    assert not is_remote_path(u"\\\\?\\C:\\evil.exe")
+    assert not is_remote_path(u"C:\\evil.exe")
+    p.GetDriveTypeW.assert_called_with(u"C:\\")
+
+    p.GetDriveTypeW.return_value = DRIVE_REMOTE
+    assert is_remote_path(u"Z:\\evil.exe")
+
+@mock.patch("mmap.mmap")
+@mock.patch("lib.common.hashing.is_remote_path")
+def test_hash_file_remote(p, q, tmpdir):
+    p.return_value = True
+    data = os.urandom(4096)
+    filepath = tmpdir.join("foo.bin")
+    filepath.write(data, "wb")
+
+    assert hash_file(hashlib.sha256, filepath.strpath) == (
+        hashlib.sha256(data).hexdigest()
+    )
+    p.assert_called_once_with(filepath.strpath)
+    q.assert_not_called()
@@ -6,7 +6,7 @@ import logging
 import mock
 import socket
 
-from lib.common.results import NetlogFile, upload_to_host
+from lib.common.results import NetlogFile, NetlogHandler, upload_to_host
 from lib.core.startup import init_logging
 
 @mock.patch("socket.create_connection")
@@ -16,8 +16,26 @@ def test_netlogfile_init(p):
     nf.sock = None
     nf.init(u"dump-\u202e.exe", u"file-\u202e.exe")
     a, b = p.return_value.sendall.call_args_list
-    assert a[0][0] == str(a[0][0])
-    assert b[0][0] == str(b[0][0])
+    assert isinstance(a[0][0], bytes)
+    assert isinstance(b[0][0], bytes)
+
+@mock.patch("socket.create_connection")
+def test_netlogfile_pids(p):
+    nf = NetlogFile()
+    nf.init(u"files/1.exe", u"C:\\1.exe", [b"1234", 5678])
+    p.return_value.sendall.assert_called_once_with(
+        b"FILE 2\nfiles/1.exe\nC:\\1.exe\n1234 5678\n"
+    )
+
+@mock.patch("socket.create_connection")
+def test_netloghandler(p):
+    with open("analysis.conf", "wb") as f:
+        f.write(b"[foo]\nip = 127.0.0.1\nport = 54321")
+    h = NetlogHandler()
+    h.emit(logging.LogRecord("foo", logging.INFO, "", 0, u"\u202e", (), None))
+    a, b = p.return_value.sendall.call_args_list
+    assert a[0][0] == b"LOG\n"
+    assert b[0][0] == b"\xe2\x80\xae\n"
 
 def test_upload_to_host():
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -45,3 +63,13 @@ def test_upload_to_host():
     )
 
     logging.getLogger().handlers = handlers
+
+@mock.patch("socket.create_connection")
+def test_upload_to_host_failed(p):
+    with open("analysis.conf", "wb") as f:
+        f.write(b"[foo]\nip = 127.0.0.1\nport = 54321")
+    p.return_value.sendall.side_effect = None, socket.error
+    assert upload_to_host(__file__, "1.py") is False
+
+    p.return_value.sendall.side_effect = None
+    assert upload_to_host(__file__, "1.py") is True